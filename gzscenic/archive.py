@@ -0,0 +1,191 @@
+"""
+Writing scenes straight into a tar or zip archive,
+and reading single scenes back out of it.
+"""
+import logging
+import typing as t
+import io
+import os
+import tarfile
+import zipfile
+import yaml
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+INDEX_NAME = 'index.yaml'
+
+
+def index_path(archive_path: str) -> str:
+    # kept next to the archive and appended to after every scene,
+    # so that the scenes written so far survive an interrupted run
+    return archive_path + '.' + INDEX_NAME
+
+
+def empty_index() -> t.Dict[str, t.Any]:
+    return {'models': {}, 'scenes': {}, 'members': {}}
+
+
+class SceneArchive:
+    """
+    An output sink that stores every scene under scenes/<scene name>/.
+    Model directories are stored once under models/<key>/ and scenes
+    only hold the files they override. Only uncompressed .tar and .zip
+    archives are supported, since members of compressed tar archives can
+    not be read without decompressing everything before them.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.zip':
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            self._tar = None
+        elif extension == '.tar':
+            self._zip = None
+            self._tar = tarfile.open(path, 'w')
+        else:
+            raise Exception(f'Unsupported archive format {extension}, use .tar or .zip')
+        self._model_keys = {}
+        self.index = empty_index()
+        self.index['format'] = 'zip' if self._zip else 'tar'
+        self._pending = empty_index()
+        with open(index_path(path), 'w') as f:
+            yaml.dump({'format': self.index['format']}, f, explicit_start=True)
+
+    def __enter__(self) -> 'SceneArchive':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        if self._zip:
+            self._zip.writestr(name, data)
+            return
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self._tar.addfile(info, io.BytesIO(data))
+        # the data is padded up to a full block right before the current offset
+        padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        self._pending['members'][name] = [self._tar.offset - padded, info.size]
+
+    def add_file(self, name: str, file_path: str) -> None:
+        with open(file_path, 'rb') as f:
+            self.add_bytes(name, f.read())
+
+    def add_model(self, model_dir: str) -> str:
+        model_dir = os.path.normpath(model_dir)
+        if model_dir in self._model_keys:
+            return self._model_keys[model_dir]
+        key = os.path.basename(model_dir)
+        while key in self.index['models'] or key in self._pending['models']:
+            key += '_'
+        files = []
+        for root, _, filenames in os.walk(model_dir):
+            for filename in sorted(filenames):
+                rel_path = os.path.relpath(os.path.join(root, filename), model_dir)
+                self.add_file(f'models/{key}/{rel_path}', os.path.join(root, filename))
+                files.append(rel_path)
+        self._model_keys[model_dir] = key
+        self._pending['models'][key] = files
+        return key
+
+    def add_scene(self,
+                  scene_name: str,
+                  world_name: str,
+                  world: bytes,
+                  models: t.Dict[str, t.Tuple[str, t.Dict[str, bytes]]],
+                  poses: t.Optional[bytes] = None) -> None:
+        if scene_name in self.index['scenes']:
+            raise Exception(f'Scene {scene_name} is already in the archive')
+        prefix = f'scenes/{scene_name}'
+        entry = {'world': world_name, 'models': {}, 'poses': poses is not None}
+        self.add_bytes(f'{prefix}/{world_name}', world)
+        for model_name, (model_dir, files) in models.items():
+            key = self.add_model(model_dir)
+            for rel_path, data in files.items():
+                self.add_bytes(f'{prefix}/models/{model_name}/{rel_path}', data)
+            entry['models'][model_name] = {'base': key, 'files': list(files)}
+        if poses is not None:
+            self.add_bytes(f'{prefix}/poses.yaml', poses)
+        self._pending['scenes'][scene_name] = entry
+        self._flush_index()
+        logger.debug(f'  Added {scene_name} to {self.path}')
+
+    def _flush_index(self) -> None:
+        # the members have to be on disk before the index refers to them
+        if self._tar:
+            self._tar.fileobj.flush()
+        for k, v in self._pending.items():
+            self.index[k].update(v)
+        with open(index_path(self.path), 'a') as f:
+            f.write(yaml.dump(self._pending, explicit_start=True))
+        self._pending = empty_index()
+
+    def close(self) -> None:
+        # the full index is also stored inside the archive, for when it travels alone
+        index = yaml.dump(self.index).encode()
+        if self._zip:
+            self._zip.writestr(INDEX_NAME, index)
+            self._zip.close()
+        else:
+            self.add_bytes(INDEX_NAME, index)
+            self._tar.close()
+
+
+def load_index(archive_path: str) -> t.Dict[str, t.Any]:
+    if os.path.exists(index_path(archive_path)):
+        index = empty_index()
+        with open(index_path(archive_path), 'rb') as f:
+            for part in yaml.safe_load_all(f):
+                for k, v in part.items():
+                    if isinstance(v, dict):
+                        index[k].update(v)
+                    else:
+                        index[k] = v
+        return index
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as z:
+            return yaml.safe_load(z.read(INDEX_NAME))
+    with tarfile.open(archive_path) as tar:
+        return yaml.safe_load(tar.extractfile(INDEX_NAME).read())
+
+
+def extract_scene(archive_path: str, scene_name: str, output: str) -> None:
+    """
+    Recreates the output directory of a single scene without
+    extracting the rest of the archive.
+    """
+    index = load_index(archive_path)
+    if scene_name not in index['scenes']:
+        raise Exception(f'Scene {scene_name} is not in {archive_path}')
+    entry = index['scenes'][scene_name]
+    prefix = f'scenes/{scene_name}'
+
+    files = {entry['world']: f'{prefix}/{entry["world"]}'}
+    if entry['poses']:
+        files['poses.yaml'] = f'{prefix}/poses.yaml'
+    for model_name, model in entry['models'].items():
+        for rel_path in index['models'][model['base']]:
+            files[f'models/{model_name}/{rel_path}'] = f'models/{model["base"]}/{rel_path}'
+        for rel_path in model['files']:
+            files[f'models/{model_name}/{rel_path}'] = f'{prefix}/models/{model_name}/{rel_path}'
+
+    if index['format'] == 'zip':
+        with zipfile.ZipFile(archive_path) as z:
+            members = {path: z.read(name) for path, name in files.items()}
+    else:
+        # tar members are read directly at the recorded offsets
+        members = {}
+        with open(archive_path, 'rb') as f:
+            for path, name in files.items():
+                offset, size = index['members'][name]
+                f.seek(offset)
+                members[path] = f.read(size)
+
+    for path, data in members.items():
+        file_path = os.path.join(output, path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            f.write(data)
@@ -0,0 +1,136 @@
+"""
+Filtering out generated scenes that are identical or nearly identical
+to scenes that were already accepted.
+"""
+import logging
+import typing as t
+import math
+from collections import OrderedDict, defaultdict
+import attr
+
+from scenic.core.scenarios import Scene
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# (gz_name, x, y, z, heading) in multiples of the filter resolution
+ObjectKey = t.Tuple[str, int, int, int, int]
+Signature = t.Tuple[ObjectKey, ...]
+
+
+@attr.s
+class FilterStats:
+    generated: int = attr.ib(default=0)
+    accepted: int = attr.ib(default=0)
+    exact_duplicates: int = attr.ib(default=0)
+    near_duplicates: int = attr.ib(default=0)
+    consecutive_duplicates: int = attr.ib(default=0)
+
+    def summary(self) -> str:
+        return (f'{self.accepted} of {self.generated} scenes accepted, '
+                f'{self.exact_duplicates} exact and {self.near_duplicates} near duplicates dropped.')
+
+
+class DiversityFilter:
+    """
+    Keeps the signatures of up to capacity accepted scenes, indexed by
+    the grid cell of each object. Positions and z are rounded to cells of
+    resolution meters and headings to steps of heading_resolution. A scene
+    is a near duplicate of another one when its objects can be paired up
+    with objects of the same model in the same or an adjacent cell and
+    heading step.
+    """
+
+    def __init__(self,
+                 resolution: float = 0.1,
+                 heading_resolution: float = math.radians(5),
+                 capacity: int = 100000) -> None:
+        self.resolution = resolution
+        self.heading_resolution = heading_resolution
+        self.heading_steps = max(round(2 * math.pi / heading_resolution), 1)
+        self.capacity = capacity
+        self.stats = FilterStats()
+        self._signatures = OrderedDict()
+        self._cells = defaultdict(set)
+
+    def signature(self, scene: Scene) -> Signature:
+        return tuple(sorted((obj.gz_name,
+                             round(obj.position.x / self.resolution),
+                             round(obj.position.y / self.resolution),
+                             round(obj.z / self.resolution),
+                             round(obj.heading / self.heading_resolution) % self.heading_steps)
+                            for obj in scene.objects))
+
+    def _close(self, a: ObjectKey, b: ObjectKey) -> bool:
+        dh = abs(a[4] - b[4]) % self.heading_steps
+        return (a[0] == b[0]
+                and abs(a[1] - b[1]) <= 1
+                and abs(a[2] - b[2]) <= 1
+                and abs(a[3] - b[3]) <= 1
+                and min(dh, self.heading_steps - dh) <= 1)
+
+    def _near(self, a: Signature, b: Signature) -> bool:
+        if len(a) != len(b):
+            return False
+        # bipartite matching with augmenting paths, scenes are small enough
+        close = [[j for j, other in enumerate(b) if self._close(obj, other)] for obj in a]
+        matched = [None] * len(b)
+
+        def augment(i, visited):
+            for j in close[i]:
+                if j not in visited:
+                    visited.add(j)
+                    if matched[j] is None or augment(matched[j], visited):
+                        matched[j] = i
+                        return True
+            return False
+
+        return all(augment(i, set()) for i in range(len(a)))
+
+    def _candidates(self, sig: Signature) -> t.Set[Signature]:
+        # a near duplicate has a counterpart next to every object, so it is
+        # in the neighbouring cells of all of them. Starting from the emptiest
+        # neighbourhood keeps crowded cells, e.g. of fixed objects, cheap.
+        if not sig:
+            return set()
+        neighbourhoods = [[self._cells.get((name, x + dx, y + dy), set())
+                           for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+                          for name, x, y, _, _ in sig]
+        neighbourhoods.sort(key=lambda cells: sum(map(len, cells)))
+        candidates = set().union(*neighbourhoods[0])
+        for cells in neighbourhoods[1:]:
+            if not candidates:
+                break
+            candidates = {other for other in candidates if any(other in cell for cell in cells)}
+        return candidates
+
+    def _add(self, sig: Signature) -> None:
+        self._signatures[sig] = None
+        for name, x, y, _, _ in sig:
+            self._cells[(name, x, y)].add(sig)
+        if len(self._signatures) > self.capacity:
+            oldest, _ = self._signatures.popitem(last=False)
+            for name, x, y, _, _ in oldest:
+                cell = self._cells[(name, x, y)]
+                cell.discard(oldest)
+                if not cell:
+                    del self._cells[(name, x, y)]
+
+    def accept(self, scene: Scene) -> bool:
+        """Whether the scene is distinct from the accepted ones, remembering it if so"""
+        self.stats.generated += 1
+        sig = self.signature(scene)
+        if sig in self._signatures:
+            self.stats.exact_duplicates += 1
+            self.stats.consecutive_duplicates += 1
+            logger.debug('  Dropped an exact duplicate scene.')
+            return False
+        if any(self._near(sig, other) for other in self._candidates(sig)):
+            self.stats.near_duplicates += 1
+            self.stats.consecutive_duplicates += 1
+            logger.debug('  Dropped a near duplicate scene.')
+            return False
+        self._add(sig)
+        self.stats.accepted += 1
+        self.stats.consecutive_duplicates = 0
+        return True
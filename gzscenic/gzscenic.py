@@ -6,6 +6,7 @@ import sys
 import time
 import argparse
 import random
+import math
 import importlib.metadata
 from shutil import copy
 import os
@@ -15,7 +16,10 @@ import scenic.syntax.translator as translator
 import scenic.core.errors as errors
 from scenic.core.simulators import SimulationCreationError
 
-from .translate import scene_to_sdf
+from .archive import SceneArchive
+from .diversity import DiversityFilter
+from .sampling import SamplingBudget, RejectionReport, generate_with_budget, failure_budget_exceeded
+from .translate import scene_to_sdf, scene_to_archive
 from .model_generator import generate_model
 from .utils import load_module
 
@@ -30,6 +34,15 @@ def setup_logging(verbose: bool = False) -> None:
     logging.getLogger('gzscenic').addHandler(log_to_stdout)
 
 
+def positive(typ):
+    def parse(value):
+        value = typ(value)
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f'{value} is not a positive number')
+        return value
+    return parse
+
+
 def setup_arg_parser():
 
     parser = argparse.ArgumentParser(prog='gzscenic', add_help=False,
@@ -45,6 +58,24 @@ def setup_arg_parser():
                             help='do not create plots for scenes')
     mainOptions.add_argument('-n', '--scenes-num', type=int,
                             help='maximum number of scenes to generate. unlimited by default')
+    mainOptions.add_argument('--archive', action='store_true',
+                            help='write all scenes into a .tar or .zip archive '
+                                 'at the output path instead of a directory')
+    mainOptions.add_argument('--max-iterations', type=positive(int), default=2000,
+                            help='give up on a scene after this many rejected samples (default 2000)')
+    mainOptions.add_argument('--max-time', type=positive(float),
+                            help='give up on a scene after this many seconds. unlimited by default')
+    mainOptions.add_argument('--max-failures', type=int, default=10,
+                            help='stop after giving up on more than this many scenes (default 10)')
+    mainOptions.add_argument('--rejection-report', type=str, default='',
+                            help='write the aggregated rejection reasons to this yaml file')
+    mainOptions.add_argument('--distinct', type=float, metavar='RESOLUTION',
+                            help='drop scenes whose objects all fall in the same or adjacent '
+                                 'RESOLUTION meter grid cells as the objects of an earlier scene')
+    mainOptions.add_argument('--distinct-heading', type=float, default=5, metavar='DEGREES',
+                            help='heading resolution used by --distinct (default 5)')
+    mainOptions.add_argument('--max-duplicates', type=int, default=1000,
+                            help='stop after this many duplicate scenes in a row (default 1000)')
     mainOptions.add_argument('-p', '--param', help='override a global parameter',
                              nargs=2, default=[], action='append', metavar=('PARAM', 'VALUE'))
     mainOptions.add_argument('-m', '--model', help='specify a Scenic world model', default=None)
@@ -89,12 +120,12 @@ def setup_arg_parser():
     return parser.parse_args()
 
 
-def generateScene(scenario, args):
+def generateScene(scenario, args, budget, report):
     startTime = time.time()
     verbosity = 3 if args.verbose else 1
-    scene, iterations = errors.callBeginningScenicTrace(
-        lambda: scenario.generate(verbosity=verbosity)
-    )
+    scene, iterations = generate_with_budget(scenario, budget, report, verbosity)
+    if scene is None:
+        return scene, iterations
     totalTime = time.time() - startTime
     logger.debug(f'  Generated scene in {iterations} iterations, {totalTime:.4g} seconds.')
     if args.show_params:
@@ -152,17 +183,53 @@ def main():
     
     if not args.noplt:
         import matplotlib.pyplot as plt
+    archive = SceneArchive(args.outputPath) if args.archive else None
+    budget = SamplingBudget(args.max_iterations, args.max_time, args.max_failures)
+    report = RejectionReport()
+    scene_filter = DiversityFilter(args.distinct, math.radians(args.distinct_heading)) \
+        if args.distinct else None
     success_count = 0
-    while not args.scenes_num or success_count < args.scenes_num:
-        scene, _ = generateScene(scenario, args)
-        if not args.noplt:
-            if delay is None:
-                scene.show(zoom=args.zoom)
+    exit_status = 0
+    try:
+        while not args.scenes_num or success_count < args.scenes_num:
+            scene, _ = generateScene(scenario, args, budget, report)
+            if scene is None:
+                if failure_budget_exceeded(budget, report):
+                    logger.error(f'Gave up on {report.failed_scenes} scenes, stopping.')
+                    exit_status = 1
+                    break
+                continue
+            if scene_filter and not scene_filter.accept(scene):
+                if scene_filter.stats.consecutive_duplicates >= args.max_duplicates:
+                    logger.error(f'Dropped {args.max_duplicates} duplicate scenes in a row, stopping.')
+                    exit_status = 1
+                    break
+                continue
+            if not args.noplt:
+                if delay is None:
+                    scene.show(zoom=args.zoom)
+                else:
+                    scene.show(zoom=args.zoom, block=False)
+                    plt.pause(delay)
+                    plt.clf()
+
+            if archive:
+                scene_to_archive(scene, input_dir, input_objects['world'], models_dir,
+                                 archive, f'scene_{success_count}')
             else:
-                scene.show(zoom=args.zoom, block=False)
-                plt.pause(delay)
-                plt.clf()
-
-        scene_to_sdf(scene, input_dir, input_objects['world'], models_dir, args.outputPath)
-        success_count += 1
-
+                scene_to_sdf(scene, input_dir, input_objects['world'], models_dir, args.outputPath)
+            success_count += 1
+    finally:
+        if archive:
+            archive.close()
+            logger.info(f'Wrote {success_count} scenes to {args.outputPath}')
+        if report.failed_scenes:
+            logger.info(f'Rejections: {report.summary()}')
+        else:
+            logger.debug(f'Rejections: {report.summary()}')
+        if args.rejection_report:
+            report.dump(args.rejection_report)
+        if scene_filter:
+            logger.info(f'Distinct scenes: {scene_filter.stats.summary()}')
+    if exit_status:
+        sys.exit(exit_status)
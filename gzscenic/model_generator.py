@@ -17,6 +17,10 @@ from scenic.core.distributions import Range
 from scenic.core.specifiers import PropertyDefault
 
 
+FOOTPRINT_MAX_VERTICES = 12
+CIRCLE_SEGMENTS = 16
+
+
 @attr.s
 class ModelInfo:
     width: float = attr.ib()
@@ -25,6 +29,7 @@ class ModelInfo:
     dynamic_size: bool = attr.ib()
     eq_width_length: bool = attr.ib(default=False)
     orig_scale: t.Tuple[float, float, float] = attr.ib(default=(1, 1, 1))
+    footprint: t.Optional[t.Tuple[t.Tuple[float, float], ...]] = attr.ib(default=None)
 
 
 def Rx(theta):
@@ -53,39 +58,102 @@ def load_collada_mesh_file(mesh_file_path: str):
     return collada.Collada(mesh_file_path)
 
 
-def mesh_min_max_bounds_collada(mesh: collada.Collada) -> t.Tuple[np.array, np.array]:
-    # Find the extrema of each components
-    min_bounds = []
-    max_bounds = []
-
+def mesh_vertices_collada(mesh: collada.Collada) -> np.array:
     unit = 1
 
     if mesh.assetInfo and mesh.assetInfo.unitmeter:
         unit = float(mesh.assetInfo.unitmeter)
 
-    for geometry in mesh.scene.objects('geometry'):
-        for primitive in geometry.primitives():
-            v = primitive.vertex
-            min_bounds.append(v.min(axis=0))
-            max_bounds.append(v.max(axis=0))
-
-    return np.array(min_bounds) * unit, np.array(max_bounds) * unit
+    vertices = [primitive.vertex
+                for geometry in mesh.scene.objects('geometry')
+                for primitive in geometry.primitives()]
+    return np.concatenate(vertices) * unit
 
 
 def load_obj_mesh_file(mesh_file_path: str):
     return pywavefront.Wavefront(mesh_file_path)
 
 
-def mesh_min_max_bounds_obj(mesh: pywavefront.Wavefront) -> t.Tuple[np.array, np.array]:
-    # Find the extrema of each components
-
-    unit = 1
+def mesh_vertices_obj(mesh: pywavefront.Wavefront) -> np.array:
+    # vertices may carry colors after the coordinates
+    return np.array(mesh.vertices)[:, :3]
+
+
+def circle_vertices(radius: float, z: float = 0, circumscribed: bool = False) -> np.array:
+    # CIRCLE_SEGMENTS is a multiple of 4, so the extrema along both axes are exact,
+    # while a circumscribed polygon never underestimates the circle
+    if circumscribed:
+        radius = radius / m.cos(m.pi / CIRCLE_SEGMENTS)
+    return np.array([[radius * m.cos(a), radius * m.sin(a), z]
+                     for a in np.linspace(0, 2 * m.pi, CIRCLE_SEGMENTS, endpoint=False)])
+
+
+def convex_hull_2d(points: np.array) -> np.array:
+    # Andrew's monotone chain, returns the hull counter-clockwise
+    points = sorted(set(map(tuple, np.round(points, 6))))
+    if len(points) <= 2:
+        return np.array(points)
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+
+def simplify_convex_polygon(hull: np.array, max_vertices: int) -> np.array:
+    """
+    Reduces a counter-clockwise convex polygon to at most max_vertices
+    by repeatedly dropping the edge whose removal adds the least area.
+    An edge is dropped by extending its two neighbouring edges until
+    they meet, so the result always contains the original polygon.
+    """
+    hull = [np.array(p, dtype=float) for p in hull]
+    while len(hull) > max(max_vertices, 3):
+        best = None
+        n = len(hull)
+        for i in range(n):
+            a, b, c, d = hull[i - 1], hull[i], hull[(i + 1) % n], hull[(i + 2) % n]
+            u, v = b - a, c - d
+            denom = u[0] * v[1] - u[1] * v[0]
+            # neighbouring edges must converge beyond the dropped edge
+            if denom >= -1e-12:
+                continue
+            w = c - b
+            s = (w[0] * v[1] - w[1] * v[0]) / denom
+            if s < 0:
+                continue
+            p = b + s * u
+            area = abs((c[0] - b[0]) * (p[1] - b[1]) - (c[1] - b[1]) * (p[0] - b[0])) / 2
+            if best is None or area < best[0]:
+                best = (area, i, p)
+        if best is None:
+            break
+        _, i, p = best
+        hull[i] = p
+        del hull[(i + 1) % n]
+    return np.array(hull)
 
-    vertices = np.array(mesh.vertices)
-    min_bounds = [vertices.min(axis=0)]
-    max_bounds = [vertices.max(axis=0)]
 
-    return np.array(min_bounds) * unit, np.array(max_bounds) * unit
+def apply_pose(vertices: np.array,
+               pose: t.Tuple[float, float, float, float, float, float]) -> np.array:
+    """
+    Moves vertices from a collision's frame to the model frame, rotating
+    them by the pose's roll, pitch and yaw first and translating them after.
+    """
+    x, y, z, roll, pitch, yaw = pose
+    # row vectors, so multiplying by the inverse rotation applies the pose rotation
+    vertices = np.asarray(np.asarray(vertices) * rotation_matrix(-roll, -pitch, -yaw))
+    return vertices + [x, y, z]
 
 
 def bounding_box(min_bounds: np.array, max_bounds: np.array) -> t.Tuple[np.array, np.array, np.array]:
@@ -104,6 +172,7 @@ def process_sdf(input_dir: str, sdf_file_path: str) -> ModelInfo:
 
     min_bounds = []
     max_bounds = []
+    footprint = []
 
     dynamic_size = True
     eq_width_length = False
@@ -111,12 +180,13 @@ def process_sdf(input_dir: str, sdf_file_path: str) -> ModelInfo:
     sdf = ET.parse(os.path.join(input_dir, sdf_file_path))
     for collision in sdf.findall('.//collision'):
         pose = collision.find('pose')
-        if pose:
-            x, y, z, roll, pitch, yaw = tuple(map(float, pose.text.split(' ')))
+        if pose is not None:
+            pose = tuple(map(float, pose.text.split()))
         else:
-            x, y, z, roll, pitch, yaw = 0, 0, 0, 0, 0, 0
+            pose = (0, 0, 0, 0, 0, 0)
         geometry = collision.find('geometry')
-        for c in geometry.getchildren():
+        for c in list(geometry):
+            outline = None
             if c.tag == 'empty':
                 continue
             elif c.tag in ['heightmap', 'image', 'plane', 'polyline']:
@@ -128,7 +198,7 @@ def process_sdf(input_dir: str, sdf_file_path: str) -> ModelInfo:
                     uri = uri[len('model://'):]
                 scale = c.find('scale')
                 if scale is not None:
-                    scale = tuple(map(float, scale.text.split(' ')))
+                    scale = tuple(map(float, scale.text.split()))
                 else:
                     scale = (1, 1, 1)
                 path = pathlib.Path(uri)
@@ -145,53 +215,79 @@ def process_sdf(input_dir: str, sdf_file_path: str) -> ModelInfo:
                 if extension == '.dae':
                     # Collada format
                     mesh = load_collada_mesh_file(mesh_path)
-                    min_b, max_b = mesh_min_max_bounds_collada(mesh)
+                    vertices = mesh_vertices_collada(mesh)
                 elif extension == '.obj' or extension == '.OBJ':
                     mesh = load_obj_mesh_file(mesh_path)
-                    min_b, max_b = mesh_min_max_bounds_obj(mesh)
+                    vertices = mesh_vertices_obj(mesh)
                 else:
                     raise Exception(f'Unsupported mesh format {extension}')
-                # TODO Handle scale and rotation
-                min_bounds.append(min_b * scale)
-                max_bounds.append(max_b * scale)
+                vertices = vertices * scale
                 eq_width_length = True
                 orig_scale = scale
-                continue
             elif c.tag == 'box':
                 size = c.find('size').text
-                size_x, size_y, size_z = tuple(map(lambda x: float(x)/2, size.split(' ')))
-                vertices = np.array([[-size_x, -size_y, -size_z],
-                                     [-size_x, -size_y, size_z]])
-            elif c.tag == 'cylinder' or c.tag == 'sphere':
+                size_x, size_y, size_z = tuple(map(lambda x: float(x)/2, size.split()))
+                vertices = np.array([[sx * size_x, sy * size_y, sz * size_z]
+                                     for sx in (-1, 1) for sy in (-1, 1) for sz in (-1, 1)])
+            elif c.tag == 'cylinder':
                 eq_width_length = True
                 radius = float(c.find('radius').text)
-                if c.tag == 'cylinder':
-                    length = float(c.find('length').text)/2
-                else:
-                    length = radius
-                vertices = np.array([[-radius, -radius, -length],
-                                     [-radius, -radius, length]])
+                length = float(c.find('length').text)/2
+                vertices = np.append(circle_vertices(radius, -length),
+                                     circle_vertices(radius, length), axis=0)
+                outline = np.append(circle_vertices(radius, -length, circumscribed=True),
+                                    circle_vertices(radius, length, circumscribed=True), axis=0)
+            elif c.tag == 'sphere':
+                eq_width_length = True
+                radius = float(c.find('radius').text)
+                vertices = np.append(circle_vertices(radius),
+                                     [[0, 0, -radius], [0, 0, radius]], axis=0)
+                outline = circle_vertices(radius, circumscribed=True)
+                # a sphere looks the same in every orientation
+                pose = pose[:3] + (0, 0, 0)
             else:
                 raise Exception(f'Unknown tag {c.tag}')
 
-            vertices = np.append(vertices, vertices * [1, -1, 1], axis=0)
-            vertices = np.append(vertices, vertices * [-1, 1, 1], axis=0)
-            vertices = vertices + [x, y, z]
-            # apply rotation
-            vertices = vertices * rotation_matrix(roll, pitch, yaw)
+            # bounds come from the exact vertices and the footprint from an outline
+            # that contains the shape, both moved to the model frame by the same pose
+            if outline is None:
+                outline = vertices
+            vertices = apply_pose(vertices, pose)
             min_bounds.append(vertices.min(axis=0))
             max_bounds.append(vertices.max(axis=0))
+            footprint.append(apply_pose(outline, pose)[:, :2])
             break
 
 
-    measures = (np.max(max_bounds, axis=0) - np.min(min_bounds, axis=0))[0]
+    measures = np.max(max_bounds, axis=0) - np.min(min_bounds, axis=0)
     print(measures)
     return ModelInfo(measures[0],
                      measures[1],
                      measures[2],
                      dynamic_size and len(max_bounds) == 1,
                      eq_width_length,
-                     orig_scale)
+                     orig_scale,
+                     normalized_footprint(footprint, measures[0], measures[1]))
+
+
+def normalized_footprint(footprint: t.List[np.array],
+                         width: float,
+                         length: float) -> t.Optional[t.Tuple[t.Tuple[float, float], ...]]:
+    """
+    Simplified convex hull of the collision geometry, relative to the
+    model's width and length so that it follows the object when scaled.
+    Like the model in Gazebo, the footprint is placed with the model origin
+    at the object's position, while Scenic's bounding box (still used for
+    containment checks) is centered on the position. The two only line up
+    when the collision geometry is centered on the model origin.
+    """
+    if not footprint or width <= 0 or length <= 0:
+        return None
+    hull = convex_hull_2d(np.concatenate(footprint))
+    if len(hull) < 3:
+        return None
+    hull = simplify_convex_polygon(hull, FOOTPRINT_MAX_VERTICES) / [width, length]
+    return tuple((round(float(px), 4), round(float(py), 4)) for px, py in hull)
 
 
 def to_camel_case(snake_str):
@@ -236,6 +332,8 @@ def to_annotations(model_desc: t.Dict[str, t.Any], input_dir: str, models_dir: s
                                 'o_height': info.height/info.orig_scale[2]})
             if info.eq_width_length:
                 annotations['width'] = PropertyDefault(('length',), {}, lambda self: self.length)
+        if info.footprint:
+            annotations['footprint'] = info.footprint
 
     if 'z' in model_desc:
         annotations['z'] = model_desc['z']
@@ -243,6 +341,9 @@ def to_annotations(model_desc: t.Dict[str, t.Any], input_dir: str, models_dir: s
         annotations['heading'] = model_desc['heading']
     if 'dynamic_size' in model_desc:
         annotations['dynamic_size'] = model_desc['dynamic_size']
+    if 'footprint' in model_desc:
+        footprint = model_desc['footprint']
+        annotations['footprint'] = tuple(map(tuple, footprint)) if footprint else None
     annotations['allowCollisions'] = model_desc.get('allow_collisions', False)
     return annotations
 
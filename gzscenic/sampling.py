@@ -0,0 +1,150 @@
+"""
+Rejection sampling of scenes under iteration, time and failure budgets,
+keeping track of what caused the rejections. The time budget relies on
+SIGALRM and is ignored on platforms without it.
+"""
+import logging
+import typing as t
+import io
+import re
+import sys
+import time
+import signal
+import contextlib
+from collections import Counter
+import attr
+import yaml
+
+import scenic.core.errors as errors
+from scenic.core.distributions import RejectionException
+from scenic.core.scenarios import Scenario, Scene
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+REJECTION_LINE = re.compile(r'Rejected sample \d+ because of: (.*)')
+
+
+@attr.s
+class SamplingBudget:
+    max_iterations: t.Optional[int] = attr.ib(default=None)
+    max_time: t.Optional[float] = attr.ib(default=None)
+    max_failures: t.Optional[int] = attr.ib(default=None)
+
+
+@attr.s
+class RejectionReport:
+    """Rejection reasons aggregated over all sampling attempts"""
+    reasons: t.Counter[str] = attr.ib(factory=Counter)
+    iterations: int = attr.ib(default=0)
+    scenes: int = attr.ib(default=0)
+    failed_scenes: int = attr.ib(default=0)
+
+    def summary(self, top: int = 10) -> str:
+        s = (f'{self.scenes} scenes generated, {self.failed_scenes} given up, '
+             f'{self.iterations} iterations in total.\n')
+        for reason, count in self.reasons.most_common(top):
+            s += f'  {count:>8} ({count / max(self.iterations, 1):.1%}) {reason}\n'
+        return s
+
+    def dump(self, path: str) -> None:
+        with open(path, 'w') as f:
+            yaml.dump({'scenes': self.scenes,
+                       'failed_scenes': self.failed_scenes,
+                       'iterations': self.iterations,
+                       'rejections': dict(self.reasons.most_common())}, f)
+
+
+class SceneTimeout(Exception):
+    pass
+
+
+class RejectionLog(io.TextIOBase):
+    """
+    Stands in for stdout while Scenic samples, collecting the reasons of
+    the rejections it reports and passing everything else through.
+    """
+
+    def __init__(self, stream: t.TextIO, echo_rejections: bool) -> None:
+        self.stream = stream
+        self.echo_rejections = echo_rejections
+        self.reasons = []
+        self._line = ''
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        self._line += s
+        while '\n' in self._line:
+            line, self._line = self._line.split('\n', 1)
+            match = REJECTION_LINE.search(line)
+            if match:
+                self.reasons.append(match.group(1))
+            if not match or self.echo_rejections:
+                self.stream.write(line + '\n')
+        return len(s)
+
+    def flush(self) -> None:
+        if self._line:
+            self.stream.write(self._line)
+            self._line = ''
+        self.stream.flush()
+
+
+@contextlib.contextmanager
+def time_limit(seconds: t.Optional[float]):
+    if seconds is None or not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+
+    def timeout(signum, frame):
+        raise SceneTimeout()
+
+    previous = signal.signal(signal.SIGALRM, timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def generate_with_budget(scenario: Scenario,
+                         budget: SamplingBudget,
+                         report: RejectionReport,
+                         verbosity: int = 1) -> t.Tuple[t.Optional[Scene], int]:
+    """
+    Samples a scene with a single call to Scenic, which is cut short when
+    the per-scene budget runs out. In that case no scene is returned.
+    """
+    startTime = time.time()
+    # Scenic only reports why a sample was rejected in its verbose output
+    log = RejectionLog(sys.stdout, verbosity >= 2)
+    max_iterations = budget.max_iterations if budget.max_iterations is not None else float('inf')
+    scene = None
+    try:
+        with time_limit(budget.max_time), contextlib.redirect_stdout(log):
+            scene, _ = errors.callBeginningScenicTrace(
+                lambda: scenario.generate(maxIterations=max_iterations,
+                                          verbosity=max(verbosity, 2))
+            )
+    except (RejectionException, SceneTimeout):
+        pass
+    finally:
+        log.flush()
+
+    iterations = len(log.reasons) + (scene is not None)
+    report.iterations += iterations
+    report.reasons.update(log.reasons)
+    if scene is not None:
+        report.scenes += 1
+        return scene, iterations
+    report.failed_scenes += 1
+    logger.warning(f'Gave up on scene after {iterations} iterations, '
+                   f'{time.time() - startTime:.4g} seconds.')
+    return None, iterations
+
+
+def failure_budget_exceeded(budget: SamplingBudget, report: RejectionReport) -> bool:
+    return budget.max_failures is not None and report.failed_scenes > budget.max_failures
@@ -17,6 +17,7 @@ from scenic.core.scenarios import Scene
 from scenic.core.object_types import Object
 
 from .gazebo.model_types import ModelTypes
+from .archive import SceneArchive
 from .utils import gazebo_dir_and_path, handle_path
 
 logger = logging.getLogger(__name__)
@@ -103,23 +104,18 @@ def process_object(obj: Object,
                 radius.text = str(obj.length/2)
 
         model.find('./model').set('name', model_name)
-        _, tf = mkstemp(dir='/tmp/', suffix='.sdf')
+        fd, tf = mkstemp(dir='/tmp/', suffix='.sdf')
+        os.close(fd)
         model_et.write(tf)
         return ObjectInfo(model_name, filedir, filepath, tf)
     return ObjectInfo(model_name, filedir, filepath) 
 
 
-def scene_to_sdf(scene: Scene,
-                 input_dir: str,
-                 empty_world: str,
-                 models_dir: str,
-                 output: str) -> None:
-
-    if os.path.exists(output):
-        shutil.rmtree(output)
-    os.makedirs(output)
-
-
+def build_scene(scene: Scene,
+                input_dir: str,
+                empty_world: str,
+                models_dir: str,
+                ) -> Tuple[ET.ElementTree, Dict[str, ObjectInfo], Dict[str, List[Dict]]]:
     no_models = {}
 
     if empty_world:
@@ -142,7 +138,31 @@ def scene_to_sdf(scene: Scene,
             obj_info = process_object(obj, i, ws_root, input_dir, models_dir)
             if obj_info and obj_info.name not in model_files:
                 model_files[obj_info.name] = obj_info
-    workspace.write(os.path.join(output, os.path.basename(empty_world)))
+    return workspace, model_files, no_models
+
+
+def model_config(obj_info: ObjectInfo) -> ET.ElementTree:
+    conf_file = os.path.join(obj_info.orig_dir, 'model.config')
+    if not os.path.exists(conf_file):
+        conf_file = CONFIG_PATH
+    config_et = ET.parse(conf_file)
+    conf_name = config_et.getroot().find('./name')
+    conf_name.text = obj_info.name
+    return config_et
+
+
+def scene_to_sdf(scene: Scene,
+                 input_dir: str,
+                 empty_world: str,
+                 models_dir: str,
+                 output: str) -> None:
+
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+
+    workspace, model_files, no_models = build_scene(scene, input_dir, empty_world, models_dir)
+    workspace.write(os.path.join(output, os.path.basename(empty_world or DEFAULT_WORLD)))
 
     if model_files:
         models_path = os.path.join(output, 'models')
@@ -151,13 +171,7 @@ def scene_to_sdf(scene: Scene,
             model_dir = os.path.join(models_path, model_name)
             if obj_info.orig_dir:
                 shutil.copytree(obj_info.orig_dir, model_dir)
-                conf_file = os.path.join(model_dir, 'model.config')
-                if not os.path.exists(conf_file):
-                    shutil.copyfile(CONFIG_PATH, conf_file)
-                config_et = ET.parse(conf_file)
-                conf_name = config_et.getroot().find('./name')
-                conf_name.text = model_name
-                config_et.write(conf_file)
+                model_config(obj_info).write(os.path.join(model_dir, 'model.config'))
             if obj_info.new_sdf_path:
                 sdf_path = os.path.join(model_dir, os.path.relpath(obj_info.orig_sdf_path, obj_info.orig_dir))
                 shutil.copyfile(obj_info.new_sdf_path, sdf_path)
@@ -167,3 +181,37 @@ def scene_to_sdf(scene: Scene,
         with open(pose_file, 'w') as f:
             yaml.dump(no_models, f)
 
+
+def scene_to_archive(scene: Scene,
+                     input_dir: str,
+                     empty_world: str,
+                     models_dir: str,
+                     archive: SceneArchive,
+                     scene_name: str) -> None:
+    """
+    Same as scene_to_sdf, but streams the scene into an open archive.
+    Model directories are stored once per archive, and only the files
+    that differ per scene (model.config and resized SDFs) are stored
+    with the scene.
+    """
+    workspace, model_files, no_models = build_scene(scene, input_dir, empty_world, models_dir)
+    world_name = os.path.basename(empty_world or DEFAULT_WORLD)
+
+    models = {}
+    for model_name, obj_info in model_files.items():
+        if not obj_info.orig_dir:
+            continue
+        files = {'model.config': ET.tostring(model_config(obj_info).getroot())}
+        if obj_info.new_sdf_path:
+            sdf_path = os.path.relpath(obj_info.orig_sdf_path, obj_info.orig_dir)
+            with open(obj_info.new_sdf_path, 'rb') as f:
+                files[sdf_path] = f.read()
+            os.remove(obj_info.new_sdf_path)
+        models[model_name] = (obj_info.orig_dir, files)
+
+    poses = yaml.dump(no_models).encode() if no_models else None
+    archive.add_scene(scene_name,
+                      world_name,
+                      ET.tostring(workspace.getroot()),
+                      models,
+                      poses)
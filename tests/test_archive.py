@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from gzscenic.archive import SceneArchive, extract_scene, index_path, load_index
+
+
+def make_model(tmp_path):
+    model_dir = tmp_path / 'box'
+    (model_dir / 'meshes').mkdir(parents=True)
+    (model_dir / 'model.sdf').write_text('<sdf/>')
+    (model_dir / 'meshes' / 'box.dae').write_text('mesh')
+    return str(model_dir)
+
+
+def add_scenes(archive, model_dir, count):
+    for i in range(count):
+        archive.add_scene(f'scene_{i}', 'workspace.world', f'<world{i}/>'.encode(),
+                          {f'box{i}': (model_dir, {'model.config': f'<name>box{i}</name>'.encode()})},
+                          b'a: 1\n' if i else None)
+
+
+@pytest.mark.parametrize('name', ['out.tar', 'out.zip'])
+def test_extract_scene(tmp_path, name):
+    model_dir = make_model(tmp_path)
+    path = str(tmp_path / name)
+    with SceneArchive(path) as archive:
+        add_scenes(archive, model_dir, 3)
+    index = load_index(path)
+    assert list(index['models']) == ['box']
+    assert len(index['scenes']) == 3
+
+    out = tmp_path / 'scene'
+    extract_scene(path, 'scene_2', str(out))
+    assert (out / 'workspace.world').read_text() == '<world2/>'
+    assert (out / 'poses.yaml').read_text() == 'a: 1\n'
+    assert (out / 'models' / 'box2' / 'model.config').read_text() == '<name>box2</name>'
+    assert (out / 'models' / 'box2' / 'meshes' / 'box.dae').read_text() == 'mesh'
+
+
+def test_interrupted_tar(tmp_path):
+    model_dir = make_model(tmp_path)
+    path = str(tmp_path / 'out.tar')
+    archive = SceneArchive(path)
+    add_scenes(archive, model_dir, 2)
+    # never closed, as if the run was killed
+    out = tmp_path / 'scene'
+    extract_scene(path, 'scene_1', str(out))
+    assert (out / 'workspace.world').read_text() == '<world1/>'
+
+
+def test_index_inside_archive(tmp_path):
+    model_dir = make_model(tmp_path)
+    path = str(tmp_path / 'out.tar')
+    with SceneArchive(path) as archive:
+        add_scenes(archive, model_dir, 2)
+    os.remove(index_path(path))
+    assert set(load_index(path)['scenes']) == {'scene_0', 'scene_1'}
+    extract_scene(path, 'scene_0', str(tmp_path / 'scene'))
+
+
+def test_compressed_tar_rejected(tmp_path):
+    with pytest.raises(Exception):
+        SceneArchive(str(tmp_path / 'out.tar.gz'))
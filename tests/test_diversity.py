@@ -0,0 +1,85 @@
+import itertools
+import math
+import random
+
+from gzscenic.diversity import DiversityFilter
+
+
+class Vector:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Object:
+    def __init__(self, gz_name, x, y, heading=0, z=0):
+        self.gz_name = gz_name
+        self.position = Vector(x, y)
+        self.heading = heading
+        self.z = z
+
+
+class Scene:
+    def __init__(self, *objects):
+        self.objects = objects
+
+
+def test_duplicates():
+    scene_filter = DiversityFilter(0.1, math.radians(5))
+    assert scene_filter.accept(Scene(Object('a', 1, 1), Object('b', 2, 2, 0.1)))
+    # same objects in a different order
+    assert not scene_filter.accept(Scene(Object('b', 2, 2, 0.1), Object('a', 1, 1)))
+    # one step away, heading wrapping around
+    assert not scene_filter.accept(Scene(Object('a', 1.09, 1, 2 * math.pi - 0.03),
+                                         Object('b', 2, 2.1, 0.1)))
+    assert scene_filter.accept(Scene(Object('a', 1.5, 1), Object('b', 2, 2, 0.1)))
+    assert scene_filter.stats.exact_duplicates == 1
+    assert scene_filter.stats.near_duplicates == 1
+    assert scene_filter.stats.consecutive_duplicates == 0
+
+
+def test_near_needs_full_matching():
+    scene_filter = DiversityFilter(1)
+    a = (('A', 2, 1, 0, 0), ('A', 2, 2, 0, 0), ('A', 2, 3, 0, 0))
+    b = (('A', 2, 1, 0, 0), ('A', 2, 3, 0, 0), ('A', 3, 1, 0, 0))
+    assert scene_filter._near(a, b)
+    assert scene_filter._near(b, a)
+
+
+def test_near_matches_brute_force():
+    scene_filter = DiversityFilter(1)
+    rng = random.Random(0)
+
+    def random_sig():
+        return tuple(sorted((rng.choice('AB'), rng.randint(0, 3), rng.randint(0, 3), 0, 0)
+                            for _ in range(3)))
+
+    for _ in range(2000):
+        a, b = random_sig(), random_sig()
+        expected = any(all(scene_filter._close(x, y) for x, y in zip(a, p))
+                       for p in itertools.permutations(b))
+        assert scene_filter._near(a, b) == expected
+
+
+def test_capacity():
+    scene_filter = DiversityFilter(0.1, capacity=2)
+    for i in range(3):
+        assert scene_filter.accept(Scene(Object('a', i, i)))
+    # the first scene was forgotten
+    assert scene_filter.accept(Scene(Object('a', 0, 0)))
+    assert not scene_filter.accept(Scene(Object('a', 2, 2)))
+    assert scene_filter.stats.consecutive_duplicates == 1
+
+
+def test_candidates_with_fixed_object():
+    scene_filter = DiversityFilter(0.1)
+    rng = random.Random(0)
+
+    def random_scene():
+        return Scene(Object('a', 0, 0), *(Object('b', rng.uniform(0, 100), rng.uniform(0, 100))
+                                          for _ in range(3)))
+
+    for _ in range(2000):
+        scene_filter.accept(random_scene())
+    assert scene_filter.stats.accepted > 1900
+    assert len(scene_filter._candidates(scene_filter.signature(random_scene()))) < 10
@@ -0,0 +1,76 @@
+import math
+
+import numpy as np
+import pytest
+import shapely.geometry
+
+from gzscenic.model_generator import (FOOTPRINT_MAX_VERTICES, circle_vertices, convex_hull_2d,
+                                      process_sdf, simplify_convex_polygon)
+
+
+BOX = '<box><size>{}</size></box>'
+CYLINDER = '<cylinder><radius>{}</radius><length>{}</length></cylinder>'
+
+
+def write_sdf(tmp_path, collisions):
+    body = ''.join(f'<collision name="c{i}"><pose>{pose}</pose><geometry>{geometry}</geometry></collision>'
+                   for i, (pose, geometry) in enumerate(collisions))
+    sdf = f'<sdf version="1.6"><model name="m"><link name="link">{body}</link></model></sdf>'
+    (tmp_path / 'model.sdf').write_text(sdf)
+    return str(tmp_path), 'model.sdf'
+
+
+def footprint_polygon(info):
+    return shapely.geometry.Polygon([(x * info.width, y * info.length) for x, y in info.footprint])
+
+
+def test_l_shaped_footprint(tmp_path):
+    info = process_sdf(*write_sdf(tmp_path, [('0 0 0 0 0 0', BOX.format('1 0.2 0.1')),
+                                             ('-0.4 0.4 0 0 0 0', BOX.format('0.2 1 0.1'))]))
+    assert info.width == pytest.approx(1)
+    assert info.length == pytest.approx(1)
+    assert info.height == pytest.approx(0.1)
+    polygon = footprint_polygon(info)
+    assert polygon.buffer(1e-6).contains(shapely.geometry.box(-0.5, -0.1, 0.5, 0.1))
+    assert polygon.buffer(1e-6).contains(shapely.geometry.box(-0.5, -0.1, -0.3, 0.9))
+    # the corner away from the L stays outside
+    assert polygon.area < 0.7
+    assert not polygon.contains(shapely.geometry.Point(0.4, 0.8))
+
+
+def test_circle_simplified_to_max_vertices():
+    circle = circle_vertices(1, 0)[:, :2]
+    hull = convex_hull_2d(circle)
+    assert len(hull) > FOOTPRINT_MAX_VERTICES
+    simplified = simplify_convex_polygon(hull, FOOTPRINT_MAX_VERTICES)
+    assert 3 <= len(simplified) <= FOOTPRINT_MAX_VERTICES
+    polygon = shapely.geometry.Polygon(simplified)
+    assert polygon.is_valid
+    assert polygon.buffer(1e-6).contains(shapely.geometry.Polygon(hull))
+
+
+def test_rotated_collision(tmp_path):
+    info = process_sdf(*write_sdf(tmp_path, [('0 0 0 0 0 0', BOX.format('0.2 0.2 0.2')),
+                                             (f'1 0 0 0 0 {math.pi / 4}', BOX.format('0.2 0.2 0.2'))]))
+    half_diagonal = 0.1 * math.sqrt(2)
+    assert info.width == pytest.approx(1.1 + half_diagonal)
+    assert info.length == pytest.approx(2 * half_diagonal)
+    footprint = np.array(info.footprint)
+    assert footprint[:, 0].max() - footprint[:, 0].min() == pytest.approx(1, abs=1e-3)
+    assert footprint[:, 1].max() - footprint[:, 1].min() == pytest.approx(1, abs=1e-3)
+    assert footprint_polygon(info).buffer(1e-3).contains(shapely.geometry.Point(1 + half_diagonal, 0))
+
+
+def test_pitched_cylinder(tmp_path):
+    info = process_sdf(*write_sdf(tmp_path, [(f'0 0 0 0 {math.pi / 2} 0', CYLINDER.format(0.1, 1))]))
+    assert info.width == pytest.approx(1)
+    assert info.length == pytest.approx(0.2)
+    assert info.height == pytest.approx(0.2)
+
+
+def test_cylinder_footprint_contains_circle(tmp_path):
+    info = process_sdf(*write_sdf(tmp_path, [('0 0 0 0 0 0', CYLINDER.format(0.5, 1))]))
+    assert info.width == pytest.approx(1)
+    assert info.length == pytest.approx(1)
+    circle = shapely.geometry.Point(0, 0).buffer(0.5, resolution=256)
+    assert footprint_polygon(info).buffer(1e-3).contains(circle)
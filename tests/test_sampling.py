@@ -0,0 +1,66 @@
+import time
+
+from scenic.core.distributions import RejectionException
+
+from gzscenic.sampling import RejectionReport, SamplingBudget, generate_with_budget
+
+
+class Scenario:
+    """Rejects a fixed number of samples, reporting them like Scenic does"""
+
+    def __init__(self, rejections, delay=0):
+        self.rejections = rejections
+        self.delay = delay
+        self.calls = []
+
+    def generate(self, maxIterations=2000, verbosity=0, feedback=None):
+        self.calls.append((maxIterations, verbosity))
+        print('from the scenario')
+        iterations = 0
+        while True:
+            if iterations > 0 and verbosity >= 2:
+                print(f'  Rejected sample {iterations} because of: object intersection')
+            if iterations >= maxIterations:
+                raise RejectionException(f'failed to generate scenario in {iterations} iterations')
+            iterations += 1
+            time.sleep(self.delay)
+            if iterations > self.rejections:
+                return 'scene', iterations
+
+
+def test_one_generate_call_per_scene(capsys):
+    scenario = Scenario(rejections=3)
+    report = RejectionReport()
+    scene, iterations = generate_with_budget(scenario, SamplingBudget(max_iterations=10), report)
+    assert scene == 'scene'
+    assert iterations == 4
+    assert scenario.calls == [(10, 2)]
+    assert report.reasons == {'object intersection': 3}
+    out = capsys.readouterr().out
+    assert 'from the scenario' in out
+    assert 'Rejected sample' not in out
+
+
+def test_verbose_output_passed_through(capsys):
+    generate_with_budget(Scenario(rejections=1), SamplingBudget(), RejectionReport(), verbosity=3)
+    assert 'Rejected sample 1 because of: object intersection' in capsys.readouterr().out
+
+
+def test_iteration_budget():
+    report = RejectionReport()
+    scene, iterations = generate_with_budget(Scenario(rejections=100),
+                                             SamplingBudget(max_iterations=5), report)
+    assert scene is None
+    assert iterations == 5
+    assert report.failed_scenes == 1
+    assert report.reasons == {'object intersection': 5}
+
+
+def test_time_budget():
+    report = RejectionReport()
+    startTime = time.time()
+    scene, _ = generate_with_budget(Scenario(rejections=1000, delay=0.01),
+                                    SamplingBudget(max_time=0.1), report)
+    assert scene is None
+    assert time.time() - startTime < 1
+    assert report.failed_scenes == 1